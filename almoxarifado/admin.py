@@ -7,7 +7,11 @@ finalidade de cada configuração principal.
 """
 
 from django.contrib import admin
-from .models import Instituicao, Funcionario, Categoria, Produto, Movimentacao
+from django.db import transaction
+from .models import (
+    Instituicao, Funcionario, Categoria, Produto, Movimentacao,
+    invalidar_caches_de_estoque,
+)
 
 
 @admin.register(Instituicao)
@@ -42,8 +46,14 @@ class CategoriaAdmin(admin.ModelAdmin):
 class ProdutoAdmin(admin.ModelAdmin):
     list_display = ('codigo', 'nome', 'categoria', 'quantidade_atual', 'quantidade_minima', 'preco_unitario', 'ativo')
     list_filter = ('ativo', 'categoria', 'instituicao', 'data_criacao')
-    search_fields = ('codigo', 'nome')
+    # `^codigo` busca só pelo início do código (istartswith), em vez de
+    # `%x%`; o índice único de `codigo` não atende a busca sem distinção de
+    # maiúsculas, então o ganho é varrer menos, não usar o índice
+    search_fields = ('^codigo', 'nome')
+    search_help_text = 'Busca pelo início do código ou por parte do nome.'
     readonly_fields = ('data_criacao', 'data_atualizacao')
+    # Carrega as FKs exibidas na listagem com JOIN (evita N+1 por linha)
+    list_select_related = ('categoria', 'instituicao')
     # Organização dos campos no formulário de edição do admin
     fieldsets = (
         ('Informações Básicas', {
@@ -58,11 +68,65 @@ class ProdutoAdmin(admin.ModelAdmin):
     )
 
 
+class BuscaPorCampoMixin:
+    """Busca do admin em um único campo por vez.
+
+    Sem prefixo, a busca usa `search_fields`. Com um prefixo de
+    `campos_de_busca` (ex.: `produto:dipirona`), filtra apenas pelo lookup
+    correspondente, em vez de combinar vários `LIKE '%x%'` com OR.
+    """
+    campos_de_busca = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        prefixo, separador, termo = search_term.partition(':')
+        lookup = self.campos_de_busca.get(prefixo.strip().lower()) if separador else None
+        if lookup is None:
+            return super().get_search_results(request, queryset, search_term)
+
+        termo = termo.strip()
+        if not termo:
+            return queryset, False
+        return queryset.filter(**{lookup: termo}), False
+
+
 @admin.register(Movimentacao)
-class MovimentacaoAdmin(admin.ModelAdmin):
+class MovimentacaoAdmin(BuscaPorCampoMixin, admin.ModelAdmin):
     list_display = ('id', 'produto', 'tipo', 'quantidade', 'funcionario', 'data_movimentacao')
     list_filter = ('tipo', 'data_movimentacao', 'produto__instituicao')
-    search_fields = ('produto__nome', 'motivo', 'funcionario__nome')
+    # Por padrão só o início do código do produto; nomes e motivo apenas com prefixo
+    # explícito, um campo por busca (ver `BuscaPorCampoMixin`)
+    search_fields = ('^produto__codigo',)
+    campos_de_busca = {
+        'produto': 'produto__nome__icontains',
+        'funcionario': 'funcionario__nome__icontains',
+        'motivo': 'motivo__icontains',
+    }
+    search_help_text = (
+        'Busca pelo início do código do produto. Use "produto:", '
+        '"funcionario:" ou "motivo:" para buscar por parte do nome ou do '
+        'motivo (ex.: produto:dipirona, motivo:doação).'
+    )
+    # Salvar por aqui grava só a movimentação: não altera o estoque nem
+    # `Produto.total_movimentacoes` (use `salvar_e_atualizar_estoque`)
     readonly_fields = ('data_movimentacao',)
+    list_select_related = ('produto', 'produto__instituicao', 'funcionario')
     # Permite navegação por data no topo da listagem
     date_hierarchy = 'data_movimentacao'
+
+    # Movimentação não tem sinais (para o Django excluí-las em lote nas
+    # cascatas); o admin invalida as métricas do dashboard uma vez por ação
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(invalidar_caches_de_estoque)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Produto.recalcular_total_movimentacoes([obj.produto_id])
+        transaction.on_commit(invalidar_caches_de_estoque)
+
+    def delete_queryset(self, request, queryset):
+        # Exclui em lote e recalcula o contador dos produtos afetados de uma vez
+        produtos = list(queryset.values_list('produto_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        Produto.recalcular_total_movimentacoes(produtos)
+        transaction.on_commit(invalidar_caches_de_estoque)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AlmoxarifadoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'almoxarifado'
+
+    def ready(self):
+        # Registra os receivers de invalidação de cache
+        from . import signals  # noqa: F401
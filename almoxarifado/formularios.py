@@ -0,0 +1,29 @@
+"""
+Utilitários para leitura dos formulários HTML enviados às views.
+
+As views do almoxarifado não usam `django.forms`: os campos são lidos de
+`request.POST` e validados manualmente. `extrair_campos` concentra a
+leitura (com `strip()`) de uma lista de campos em um único dicionário.
+"""
+
+# `str.strip` resolvido uma única vez, fora do laço de `extrair_campos`
+_strip = str.strip
+
+
+def extrair_campos(post, campos, padroes=None):
+    """Lê `campos` de `post` (ex.: `request.POST`) já sem espaços nas pontas.
+
+    Campos ausentes recebem o valor de `padroes[campo]`, ou `''`; campos
+    enviados vazios continuam `''`. Retorna um dicionário `{campo: valor}`
+    na mesma ordem de `campos`.
+    """
+    padroes = padroes or {}
+    dados = {}
+    for campo in campos:
+        valor = post.get(campo)
+        if valor is None:
+            dados[campo] = padroes.get(campo, '')
+        else:
+            # Valor vazio dispensa a chamada a strip()
+            dados[campo] = _strip(valor) if valor else valor
+    return dados
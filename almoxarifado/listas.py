@@ -0,0 +1,77 @@
+"""
+Listas pouco mutáveis usadas nos <select> dos formulários.
+
+Instituições e categorias ativas são exibidas em quase todo formulário e
+mudam raramente, por isso ficam em cache (apenas `id` e `nome`). Os
+sinais em `almoxarifado.signals` descartam a entrada correspondente
+sempre que um registro é salvo ou removido.
+"""
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Categoria, Instituicao, CATEGORIAS_CACHE_KEY, INSTITUICOES_CACHE_KEY
+
+
+# Tempo (em segundos) que as listas permanecem em cache
+LISTAS_CACHE_TIMEOUT = 300
+
+
+def instituicoes_ativas():
+    """Instituições ativas (id e nome), em ordem alfabética."""
+    return cache.get_or_set(
+        INSTITUICOES_CACHE_KEY,
+        lambda: list(Instituicao.objects.filter(ativo=True).only('id', 'nome').order_by('nome')),
+        LISTAS_CACHE_TIMEOUT,
+    )
+
+
+def categorias_ativas():
+    """Categorias ativas (id e nome), em ordem alfabética."""
+    return cache.get_or_set(
+        CATEGORIAS_CACHE_KEY,
+        lambda: list(Categoria.objects.filter(ativo=True).only('id', 'nome').order_by('nome')),
+        LISTAS_CACHE_TIMEOUT,
+    )
+
+
+def por_id(objetos):
+    """Indexa `objetos` pelo id em texto, como o id chega do formulário.
+
+    Usado para validar o valor de um <select> contra uma das listas acima
+    sem consultar o banco.
+    """
+    return {str(obj.id): obj for obj in objetos}
+
+
+def _buscar(modelo, ativos, objeto_id, atual_id):
+    """Objeto de `modelo` escolhido no formulário (`objeto_id` em texto), ou None.
+
+    Procura primeiro na lista cacheada `ativos`. Se não estiver lá — o
+    cache deste processo pode ainda não ter um registro recém-criado —
+    confirma no banco. `atual_id`, o valor atual do registro em edição, é
+    aceito mesmo que tenha sido desativado depois.
+    """
+    objeto = por_id(ativos).get(objeto_id)
+    if objeto is not None:
+        return objeto
+
+    try:
+        objeto_id = int(objeto_id)
+    except ValueError:
+        return None
+
+    permitidos = Q(ativo=True)
+    if atual_id is not None:
+        permitidos |= Q(pk=atual_id)
+    return modelo.objects.filter(permitidos, pk=objeto_id).only('id', 'nome').first()
+
+
+def buscar_instituicao(instituicao_id, atual_id=None):
+    """Instituição escolhida no formulário, ou None (ver `_buscar`)."""
+    return _buscar(Instituicao, instituicoes_ativas(), instituicao_id, atual_id)
+
+
+def buscar_categoria(categoria_id, atual_id=None):
+    """Categoria escolhida no formulário, ou None (ver `_buscar`)."""
+    return _buscar(Categoria, categorias_ativas(), categoria_id, atual_id)
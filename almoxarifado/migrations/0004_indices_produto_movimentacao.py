@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-15 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almoxarifado', '0003_categoria_alter_funcionario_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['-data_movimentacao'], name='almoxarifad_data_mo_e16529_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['tipo', 'data_movimentacao'], name='almoxarifad_tipo_00400d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['produto', '-data_movimentacao'], name='almoxarifad_produto_1d9bb3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['ativo'], name='almoxarifad_ativo_ceb61a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['instituicao', 'ativo'], name='almoxarifad_institu_76945d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['categoria', 'ativo'], name='almoxarifad_categor_c9f611_idx'),
+        ),
+    ]
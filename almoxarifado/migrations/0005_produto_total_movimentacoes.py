@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-15 02:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_total_movimentacoes(apps, schema_editor):
+    """Calcula o contador a partir das movimentações já existentes."""
+    Produto = apps.get_model('almoxarifado', 'Produto')
+    Movimentacao = apps.get_model('almoxarifado', 'Movimentacao')
+
+    totais = Movimentacao.objects.filter(produto=OuterRef('pk')).order_by().values(
+        'produto'
+    ).annotate(total=Count('id')).values('total')
+    Produto.objects.update(total_movimentacoes=Coalesce(Subquery(totais), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almoxarifado', '0004_indices_produto_movimentacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='total_movimentacoes',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(preencher_total_movimentacoes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-15 02:39
+
+from django.db import migrations, models
+
+
+# Correspondência entre o formato antigo (texto) e o novo (inteiro)
+TIPOS = {'entrada': 1, 'saida': 2, 'ajuste': 3}
+
+
+def tipo_texto_para_inteiro(apps, schema_editor):
+    Movimentacao = apps.get_model('almoxarifado', 'Movimentacao')
+    for texto, numero in TIPOS.items():
+        Movimentacao.objects.filter(tipo=texto).update(tipo_numero=numero)
+
+
+def tipo_inteiro_para_texto(apps, schema_editor):
+    Movimentacao = apps.get_model('almoxarifado', 'Movimentacao')
+    for texto, numero in TIPOS.items():
+        Movimentacao.objects.filter(tipo_numero=numero).update(tipo=texto)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almoxarifado', '0005_produto_total_movimentacoes'),
+    ]
+
+    operations = [
+        # O índice composto depende da coluna antiga; é recriado no final
+        migrations.RemoveIndex(
+            model_name='movimentacao',
+            name='almoxarifad_tipo_00400d_idx',
+        ),
+        # Coluna antiga passa a aceitar NULL para que a migração seja reversível
+        migrations.AlterField(
+            model_name='movimentacao',
+            name='tipo',
+            field=models.CharField(choices=[('entrada', 'Entrada'), ('saida', 'Saída'), ('ajuste', 'Ajuste')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='movimentacao',
+            name='tipo_numero',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(tipo_texto_para_inteiro, tipo_inteiro_para_texto),
+        migrations.RemoveField(
+            model_name='movimentacao',
+            name='tipo',
+        ),
+        migrations.RenameField(
+            model_name='movimentacao',
+            old_name='tipo_numero',
+            new_name='tipo',
+        ),
+        migrations.AlterField(
+            model_name='movimentacao',
+            name='tipo',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Entrada'), (2, 'Saída'), (3, 'Ajuste')]),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['tipo', 'data_movimentacao'], name='almoxarifad_tipo_00400d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(condition=models.Q(('tipo', 2)), fields=['data_movimentacao'], name='idx_mov_saida_data'),
+        ),
+    ]
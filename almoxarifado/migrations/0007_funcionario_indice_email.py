@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-15 02:42
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almoxarifado', '0006_movimentacao_tipo_inteiro'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='funcionario',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='func_upper_email'),
+        ),
+    ]
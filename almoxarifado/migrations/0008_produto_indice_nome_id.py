@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almoxarifado', '0007_funcionario_indice_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['nome', 'id'], name='almoxarifad_nome_619e3a_idx'),
+        ),
+    ]
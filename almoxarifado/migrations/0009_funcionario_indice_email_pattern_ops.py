@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# No PostgreSQL, `email__istartswith` gera `UPPER("email"::text) LIKE UPPER(...)`.
+# Um btree comum só atende LIKE por prefixo com collation "C"; com a classe
+# de operadores `text_pattern_ops` o índice funciona em qualquer collation.
+# O SQLite não aceita classes de operadores, então lá nada muda.
+INDICE_PATTERN_OPS = (
+    'CREATE INDEX "func_upper_email" ON "almoxarifado_funcionario" '
+    '((UPPER("email"::text)) text_pattern_ops)'
+)
+INDICE_SIMPLES = (
+    'CREATE INDEX "func_upper_email" ON "almoxarifado_funcionario" '
+    '((UPPER("email")))'
+)
+
+
+def _recriar_indice(schema_editor, sql):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS "func_upper_email"')
+    schema_editor.execute(sql)
+
+
+def usar_pattern_ops(apps, schema_editor):
+    _recriar_indice(schema_editor, INDICE_PATTERN_OPS)
+
+
+def usar_indice_simples(apps, schema_editor):
+    _recriar_indice(schema_editor, INDICE_SIMPLES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almoxarifado', '0008_produto_indice_nome_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(usar_pattern_ops, usar_indice_simples),
+    ]
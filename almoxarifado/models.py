@@ -8,14 +8,43 @@ estoque baixo e atualizar estoque durante uma movimentação).
 Observações de uso:
 - `Produto.unique_together` garante código único por instituição.
 - `Movimentacao.salvar_e_atualizar_estoque` aplica a lógica de negócio
-    para entrada/saída/ajuste e salva tanto o produto quanto a movimentação.
+    para entrada/saída/ajuste e salva tanto o produto quanto a movimentação
+    em uma única transação; `Movimentacao.aplicar_em_lote` faz o mesmo para
+    várias movimentações com `bulk_update`/`bulk_create`.
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Upper
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
 
 
+# Chave de cache das métricas agregadas do dashboard
+DASHBOARD_CACHE_KEY = 'dashboard:metricas'
+# Chave de cache da lista de instituições ativas (usada nos formulários);
+# invalidada pelos sinais em `almoxarifado.signals`
+INSTITUICOES_CACHE_KEY = 'instituicoes:ativas'
+# Chave de cache da lista de categorias ativas (idem)
+CATEGORIAS_CACHE_KEY = 'categorias:ativas'
+# Chave de cache do <select> de produtos (entrada/saída), que exibe o saldo
+PRODUTOS_DROPDOWN_CACHE_KEY = 'produtos:dropdown'
+# Chave de cache do id do funcionário atribuído às movimentações registradas
+# pelas views; invalidada pelos sinais em `almoxarifado.signals`
+FUNCIONARIO_PADRAO_CACHE_KEY = 'funcionarios:padrao_id'
+
+
+def invalidar_caches_de_estoque():
+    """Descarta os caches que dependem do saldo dos produtos.
+
+    Alterações de estoque usam `update()`/`bulk_update()`, que não disparam
+    sinais; por isso os métodos de `Movimentacao` (e a exclusão lógica em
+    `deletar_produto`) chamam esta função.
+    """
+    cache.delete_many([DASHBOARD_CACHE_KEY, PRODUTOS_DROPDOWN_CACHE_KEY])
+
+
 class Instituicao(models.Model):
     """Representa uma instituição/empresa que possui produtos no almoxarifado."""
     nome = models.CharField(max_length=100)
@@ -49,6 +78,13 @@ class Funcionario(models.Model):
 
     class Meta:
         ordering = ['nome']
+        # `email__istartswith` compara UPPER(email) LIKE 'X%' no PostgreSQL.
+        # Lá a migração 0009 recria este índice com `text_pattern_ops`,
+        # para que atenda o LIKE por prefixo com collation diferente de "C"
+        # (o SQLite não aceita classes de operadores)
+        indexes = [
+            models.Index(Upper('email'), name='func_upper_email'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -79,6 +115,10 @@ class Produto(models.Model):
     quantidade_minima = models.PositiveIntegerField(default=0)
     quantidade_atual = models.PositiveIntegerField(default=0)
     preco_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Contador desnormalizado: incrementado por `Movimentacao.salvar_e_atualizar_estoque`
+    # e `aplicar_em_lote`; recalculado quando o admin exclui movimentações
+    # (`recalcular_total_movimentacoes`). Saves do admin não o incrementam
+    total_movimentacoes = models.PositiveIntegerField(default=0, db_index=True)
     ativo = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
@@ -86,6 +126,14 @@ class Produto(models.Model):
     class Meta:
         unique_together = ['codigo', 'instituicao']
         ordering = ['nome']
+        # Índices para os filtros mais usados (dashboard, listas e relatórios)
+        indexes = [
+            models.Index(fields=['ativo']),
+            models.Index(fields=['instituicao', 'ativo']),
+            models.Index(fields=['categoria', 'ativo']),
+            # Paginação por chave da lista de produtos (ordem nome, id)
+            models.Index(fields=['nome', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.codigo} - {self.nome}"
@@ -94,16 +142,49 @@ class Produto(models.Model):
         """Retorna True se a quantidade atual for menor ou igual à mínima."""
         return self.quantidade_atual <= self.quantidade_minima
 
+    @classmethod
+    def recalcular_total_movimentacoes(cls, ids):
+        """Recalcula `total_movimentacoes` dos produtos `ids` com um único UPDATE.
+
+        Conta as movimentações de cada produto numa subconsulta, em vez de
+        descontar uma a uma (o que impediria o Django de excluir
+        movimentações em lote).
+        """
+        contagem = (
+            Movimentacao.objects.filter(produto=OuterRef('pk'))
+            .order_by().values('produto')
+            .annotate(total=Count('id')).values('total')
+        )
+        cls.objects.filter(pk__in=ids).update(
+            total_movimentacoes=Coalesce(Subquery(contagem), 0)
+        )
+
 
 class Movimentacao(models.Model):
-    TIPO_CHOICES = [
-        ('entrada', 'Entrada'),
-        ('saida', 'Saída'),
-        ('ajuste', 'Ajuste'),
-    ]
+    class Tipo(models.IntegerChoices):
+        """Tipos de movimentação, armazenados como inteiro pequeno."""
+        ENTRADA = 1, 'Entrada'
+        SAIDA = 2, 'Saída'
+        AJUSTE = 3, 'Ajuste'
+
+        @classmethod
+        def parse(cls, valor):
+            """Converte o valor de um filtro GET em `Tipo`.
+
+            Aceita o número (`'1'`) ou o nome antigo em texto (`'entrada'`),
+            mantendo links salvos funcionando. Retorna None se inválido.
+            """
+            try:
+                numero = int(valor)
+            except ValueError:
+                # Não é número: tenta o nome (`'entrada'`, `'saida'`...)
+                return cls.__members__.get(valor.upper())
+            return cls(numero) if numero in cls.values else None
+
+    TIPO_CHOICES = Tipo.choices
 
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
-    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    tipo = models.PositiveSmallIntegerField(choices=Tipo.choices)
     quantidade = models.PositiveIntegerField()
     motivo = models.TextField(blank=True)
     funcionario = models.ForeignKey(Funcionario, on_delete=models.SET_NULL, null=True)
@@ -112,6 +193,17 @@ class Movimentacao(models.Model):
 
     class Meta:
         ordering = ['-data_movimentacao']
+        indexes = [
+            models.Index(fields=['-data_movimentacao']),
+            models.Index(fields=['tipo', 'data_movimentacao']),
+            models.Index(fields=['produto', '-data_movimentacao']),
+            # Índice parcial só com saídas (tipo=2, `Tipo.SAIDA`)
+            models.Index(
+                fields=['data_movimentacao'],
+                condition=models.Q(tipo=2),
+                name='idx_mov_saida_data',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.produto.nome} ({self.quantidade})"
@@ -124,23 +216,106 @@ class Movimentacao(models.Model):
           caso contrário.
         - `ajuste`: define o estoque para o valor informado (uso administrativo).
 
-        Este método salva primeiro o `produto` e em seguida a própria
-        `movimentacao` garantindo consistência do estoque.
+        O estoque é alterado com um único `UPDATE` usando `F()` (a conta é
+        feita no banco, que trava a linha do produto) e a movimentação é
+        salva na mesma transação. Para `saida`, a verificação de saldo faz
+        parte do `WHERE`, evitando que duas saídas simultâneas deixem o
+        estoque negativo. O mesmo `UPDATE` incrementa
+        `Produto.total_movimentacoes`; após o commit, os caches que dependem
+        do estoque (dashboard e lista de produtos) são invalidados.
         """
-        if self.tipo == 'entrada':
-            self.produto.quantidade_atual += self.quantidade
-        elif self.tipo == 'saida':
-            if self.produto.quantidade_atual >= self.quantidade:
+        with transaction.atomic():
+            produtos = Produto.objects.filter(pk=self.produto_id)
+            comuns = {
+                'total_movimentacoes': F('total_movimentacoes') + 1,
+                'data_atualizacao': timezone.now(),
+            }
+
+            if self.tipo == self.Tipo.ENTRADA:
+                produtos.update(
+                    quantidade_atual=F('quantidade_atual') + self.quantidade,
+                    **comuns,
+                )
+            elif self.tipo == self.Tipo.SAIDA:
+                atualizados = produtos.filter(
+                    quantidade_atual__gte=self.quantidade
+                ).update(
+                    quantidade_atual=F('quantidade_atual') - self.quantidade,
+                    **comuns,
+                )
+                if not atualizados:
+                    # Protege contra estoque negativo — chamador deve tratar a exceção
+                    raise ValueError("Quantidade insuficiente em estoque")
+            elif self.tipo == self.Tipo.AJUSTE:
+                # Ajuste define explicitamente a quantidade atual
+                produtos.update(quantidade_atual=self.quantidade, **comuns)
+
+            self.save()
+            # Caches de estoque só são descartados se a transação confirmar
+            transaction.on_commit(invalidar_caches_de_estoque)
+
+        # Mantém o produto já carregado em memória coerente com o banco
+        if Movimentacao.produto.is_cached(self):
+            self.produto.total_movimentacoes += 1
+            if self.tipo == self.Tipo.ENTRADA:
+                self.produto.quantidade_atual += self.quantidade
+            elif self.tipo == self.Tipo.SAIDA:
                 self.produto.quantidade_atual -= self.quantidade
-            else:
-                # Protege contra estoque negativo — chamador deve tratar a exceção
-                raise ValueError("Quantidade insuficiente em estoque")
-        elif self.tipo == 'ajuste':
-            # Ajuste define explicitamente a quantidade atual
-            self.produto.quantidade_atual = self.quantidade
+            elif self.tipo == self.Tipo.AJUSTE:
+                self.produto.quantidade_atual = self.quantidade
+
+    @classmethod
+    def aplicar_em_lote(cls, movimentacoes):
+        """Aplica várias movimentações de uma vez (importações, inventário).
+
+        Equivale a chamar `salvar_e_atualizar_estoque` para cada item, mas
+        trava os produtos envolvidos com `select_for_update`, calcula os
+        novos saldos em Python e grava tudo com um `bulk_update` de
+        produtos e um `bulk_create` de movimentações, numa única transação.
+        Se alguma saída não tiver estoque suficiente, lança `ValueError` e
+        nada é gravado. Os mesmos caches de `salvar_e_atualizar_estoque` são
+        invalidados após o commit. Retorna a lista de movimentações criadas.
+        """
+        movimentacoes = list(movimentacoes)
+        if not movimentacoes:
+            return []
+
+        with transaction.atomic():
+            produtos = Produto.objects.select_for_update().in_bulk(
+                {mov.produto_id for mov in movimentacoes}
+            )
+
+            for mov in movimentacoes:
+                produto = produtos.get(mov.produto_id)
+                if produto is None:
+                    raise Produto.DoesNotExist(f"Produto {mov.produto_id} não encontrado")
+
+                if mov.tipo == cls.Tipo.ENTRADA:
+                    produto.quantidade_atual += mov.quantidade
+                elif mov.tipo == cls.Tipo.SAIDA:
+                    if produto.quantidade_atual < mov.quantidade:
+                        raise ValueError(f"Quantidade insuficiente em estoque: {produto}")
+                    produto.quantidade_atual -= mov.quantidade
+                elif mov.tipo == cls.Tipo.AJUSTE:
+                    produto.quantidade_atual = mov.quantidade
+
+                produto.total_movimentacoes += 1
+                mov.produto = produto
+
+            agora = timezone.now()
+            for produto in produtos.values():
+                produto.data_atualizacao = agora
+
+            Produto.objects.bulk_update(
+                produtos.values(),
+                ['quantidade_atual', 'total_movimentacoes', 'data_atualizacao'],
+            )
+            criadas = cls.objects.bulk_create(movimentacoes)
+            transaction.on_commit(invalidar_caches_de_estoque)
 
-        # Persiste alteração de estoque e a movimentação
-        self.produto.save()
-        self.save()
+        return criadas
 
 
+# Opções de tipo para os filtros de listagem e relatórios — tupla calculada
+# uma vez, na importação do módulo
+TIPOS_MOVIMENTACAO = tuple(Movimentacao.TIPO_CHOICES)
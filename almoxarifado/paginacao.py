@@ -0,0 +1,160 @@
+"""
+Utilitários de paginação do app `almoxarifado`.
+
+O `Paginator` do Django executa um `SELECT COUNT(*)` a cada página para
+saber o total de páginas. Nas listagens grandes em que o total não é
+exibido, usamos as alternativas deste módulo, que buscam apenas a página
+pedida (mais um registro para saber se existe próxima página):
+
+- `paginar_sem_contagem`: LIMIT/OFFSET por número de página.
+- `paginar_por_chave`: paginação por chave (keyset/seek) — filtra a partir
+  do último registro exibido em vez de usar OFFSET, com custo constante
+  em qualquer profundidade.
+"""
+
+from django.db.models import Q
+
+
+# Maior valor aceito em LIMIT/OFFSET (inteiro de 64 bits com sinal)
+_MAIOR_INTEIRO_SQL = 2 ** 63 - 1
+
+
+class PaginaSemContagem:
+    """Página de resultados cujo total de páginas não é conhecido.
+
+    Expõe a mesma interface de `django.core.paginator.Page` usada pelos
+    templates (`number`, `has_next`, `next_page_number` etc.), exceto o
+    que depende do total (`paginator.num_pages`).
+    """
+
+    def __init__(self, object_list, number, tem_proxima):
+        self.object_list = object_list
+        self.number = number
+        self._tem_proxima = tem_proxima
+
+    def __repr__(self):
+        return f'<Página {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._tem_proxima
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def paginar_sem_contagem(queryset, numero, por_pagina):
+    """Retorna a página `numero` de `queryset` sem executar COUNT.
+
+    Busca `por_pagina + 1` registros: o excedente indica que existe
+    próxima página e é descartado. Números inválidos — ou tão grandes que
+    o OFFSET não caberia num inteiro de 64 bits do banco — viram a página 1.
+    """
+    try:
+        numero = max(int(numero), 1)
+    except (TypeError, ValueError):
+        numero = 1
+    if numero * por_pagina + 1 > _MAIOR_INTEIRO_SQL:
+        numero = 1
+
+    inicio = (numero - 1) * por_pagina
+    itens = list(queryset[inicio:inicio + por_pagina + 1])
+    return PaginaSemContagem(itens[:por_pagina], numero, len(itens) > por_pagina)
+
+
+class PaginaPorChave:
+    """Página de uma paginação por chave (keyset).
+
+    Não há número de página: a próxima página é identificada pelo id do
+    último registro exibido (`next_after`), passado de volta em `?after=`.
+    """
+
+    def __init__(self, object_list, tem_anterior, tem_proxima):
+        self.object_list = object_list
+        self._tem_anterior = tem_anterior
+        self._tem_proxima = tem_proxima
+
+    def __repr__(self):
+        return f'<Página por chave ({len(self)} itens)>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._tem_proxima
+
+    def has_previous(self):
+        return self._tem_anterior
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def next_after(self):
+        """Id do último registro da página — valor de `?after=` da próxima."""
+        return self.object_list[-1].pk if self.object_list else None
+
+
+def _depois_de(ordem, valores):
+    """Monta o filtro "linha vem depois de `valores`" para a ordenação `ordem`.
+
+    Para `('nome', 'id')` gera `nome > v1 OR (nome = v1 AND id > v2)`;
+    campos com `-` usam `<`.
+    """
+    condicao = Q()
+    iguais = {}
+    for campo in ordem:
+        nome = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicao |= Q(**iguais, **{f'{nome}__{operador}': valores[nome]})
+        iguais[nome] = valores[nome]
+    return condicao
+
+
+def paginar_por_chave(queryset, apos, por_pagina, ordem=('-id',)):
+    """Retorna a página de `queryset` que começa logo após o registro `apos`.
+
+    `ordem` deve terminar em um campo único (normalmente `id`) para que a
+    ordenação seja total. Quando a ordenação tem outros campos, os valores
+    do registro `apos` são lidos com uma consulta pela chave primária.
+    Valores inválidos de `apos` (ou registro inexistente) voltam à
+    primeira página.
+    """
+    queryset = queryset.order_by(*ordem)
+
+    try:
+        apos = int(apos)
+    except (TypeError, ValueError):
+        apos = None
+
+    if apos is not None:
+        campos = [campo.lstrip('-') for campo in ordem]
+        if campos == ['id']:
+            valores = {'id': apos}
+        else:
+            valores = queryset.model._default_manager.filter(pk=apos).values(*campos).first()
+        if valores is None:
+            apos = None
+        else:
+            queryset = queryset.filter(_depois_de(ordem, valores))
+
+    itens = list(queryset[:por_pagina + 1])
+    return PaginaPorChave(itens[:por_pagina], apos is not None, len(itens) > por_pagina)
+
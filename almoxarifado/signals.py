@@ -0,0 +1,48 @@
+"""
+Sinais do app `almoxarifado`.
+
+Mantêm os caches de listas pouco mutáveis (usadas em formulários) e as
+métricas do dashboard coerentes com o banco, descartando a entrada
+correspondente sempre que um registro é salvo ou removido.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Categoria, Funcionario, Instituicao, Produto,
+    CATEGORIAS_CACHE_KEY, FUNCIONARIO_PADRAO_CACHE_KEY, INSTITUICOES_CACHE_KEY,
+    invalidar_caches_de_estoque,
+)
+
+
+@receiver([post_save, post_delete], sender=Instituicao)
+def invalidar_cache_instituicoes(sender, **kwargs):
+    """Descarta a lista cacheada de instituições ativas."""
+    cache.delete(INSTITUICOES_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=Categoria)
+def invalidar_cache_categorias(sender, **kwargs):
+    """Descarta a lista cacheada de categorias ativas."""
+    cache.delete(CATEGORIAS_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=Produto)
+def invalidar_cache_produtos(sender, **kwargs):
+    """Descarta o <select> de produtos e as métricas do dashboard.
+
+    Cobre cadastro, edição e exclusão (inclusive em cascata, ao excluir
+    uma instituição), que mudam totais e valor do estoque. As
+    movimentações excluídas junto com o produto são cobertas por aqui:
+    `Movimentacao` não tem sinais, para que o Django as exclua em lote.
+    """
+    transaction.on_commit(invalidar_caches_de_estoque)
+
+
+@receiver([post_save, post_delete], sender=Funcionario)
+def invalidar_cache_funcionario_padrao(sender, **kwargs):
+    """Descarta o id cacheado do funcionário padrão das movimentações."""
+    cache.delete(FUNCIONARIO_PADRAO_CACHE_KEY)
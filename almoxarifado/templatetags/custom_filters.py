@@ -10,22 +10,36 @@ Uso nos templates:
     {{ produto.quantidade_atual|multiply:produto.preco_unitario }}
 
 """
+from decimal import Decimal
+
 from django import template
 
 register = template.Library()
 
+# Tipos numéricos multiplicados diretamente, sem conversão para float
+_NUMERICOS = (int, float, Decimal)
+_ERROS_CONVERSAO = (ValueError, TypeError)
+
 
-@register.filter
+@register.filter(is_safe=True)
 def multiply(value, arg):
     """Multiplica `value` por `arg`.
 
-    Ambos os parâmetros são convertidos para float. Se a conversão falhar
+    Se ambos já forem numéricos (int, float ou Decimal) são multiplicados
+    diretamente — ex.: int * Decimal preserva a precisão do preço. Caso
+    contrário, ambos são convertidos para float. Se a conversão falhar
     (valor inválido ou None), o filtro retorna 0 para evitar erros no
     template e permitir exibição segura.
     """
+    if isinstance(value, _NUMERICOS) and isinstance(arg, _NUMERICOS):
+        try:
+            return value * arg
+        except TypeError:
+            # Decimal * float não é suportado — segue pela conversão abaixo
+            pass
     try:
         return float(value) * float(arg)
-    except (ValueError, TypeError):
+    except _ERROS_CONVERSAO:
         # Retorna 0 em caso de dados inválidos — facilita o uso em relatórios
         # sem necessidade de validação adicional no template.
         return 0
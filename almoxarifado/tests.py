@@ -1,3 +1,216 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import (
+    Instituicao, Movimentacao, Produto,
+    DASHBOARD_CACHE_KEY, PRODUTOS_DROPDOWN_CACHE_KEY,
+)
+from .paginacao import paginar_por_chave
+
+
+def criar_instituicao():
+    return Instituicao.objects.create(
+        nome='Instituição Teste', cep='00000-000', logradouro='Rua A',
+        numero='1', bairro='Centro', cidade='Cidade', estado='SP',
+        telefone='0000-0000', cnpj='00.000.000/0001-00',
+    )
+
+
+class PaginarPorChaveTests(TestCase):
+    """Paginação por `(nome, id)`, como em `lista_produtos`."""
+
+    ORDEM = ('nome', 'id')
+
+    @classmethod
+    def setUpTestData(cls):
+        instituicao = criar_instituicao()
+        # Nomes repetidos: o desempate precisa vir do id
+        for i, nome in enumerate(['Beta', 'Alfa', 'Beta', 'Alfa', 'Beta']):
+            Produto.objects.create(codigo=f'P{i}', nome=nome, instituicao=instituicao)
+        cls.ordenados = list(Produto.objects.order_by(*cls.ORDEM))
+
+    def paginar(self, apos, por_pagina=2):
+        return paginar_por_chave(Produto.objects.all(), apos, por_pagina, ordem=self.ORDEM)
+
+    def test_percorre_todas_as_paginas_com_nomes_repetidos(self):
+        vistos = []
+        apos = None
+        while True:
+            pagina = self.paginar(apos)
+            vistos.extend(pagina)
+            if not pagina.has_next():
+                break
+            apos = pagina.object_list[-1].id
+
+        self.assertEqual(vistos, self.ordenados)
+
+    def test_pagina_seguinte_comeca_apos_o_registro(self):
+        pagina = self.paginar(self.ordenados[1].id)
+
+        self.assertTrue(pagina.has_previous())
+        self.assertEqual(list(pagina), self.ordenados[2:4])
+
+    def test_apos_invalido_volta_a_primeira_pagina(self):
+        for apos in ('abc', '', None):
+            with self.subTest(apos=apos):
+                pagina = self.paginar(apos)
+                self.assertFalse(pagina.has_previous())
+                self.assertEqual(list(pagina), self.ordenados[:2])
+
+    def test_apos_registro_excluido_volta_a_primeira_pagina(self):
+        excluido = self.ordenados[2]
+        excluido.delete()
+
+        pagina = self.paginar(excluido.id)
+
+        self.assertFalse(pagina.has_previous())
+        self.assertEqual(list(pagina), self.ordenados[:2])
+
+
+
+
+class SalvarEAtualizarEstoqueTests(TestCase):
+
+    def setUp(self):
+        self.produto = Produto.objects.create(
+            codigo='P1', nome='Produto', instituicao=criar_instituicao(), quantidade_atual=5,
+        )
+
+    def movimentar(self, tipo, quantidade):
+        Movimentacao(produto=self.produto, tipo=tipo, quantidade=quantidade).salvar_e_atualizar_estoque()
+        self.produto.refresh_from_db()
+
+    def test_entrada_e_saida_atualizam_estoque_e_contador(self):
+        self.movimentar(Movimentacao.Tipo.ENTRADA, 3)
+        self.movimentar(Movimentacao.Tipo.SAIDA, 8)
+
+        self.assertEqual(self.produto.quantidade_atual, 0)
+        self.assertEqual(self.produto.total_movimentacoes, 2)
+        self.assertEqual(Movimentacao.objects.count(), 2)
+
+    def test_saida_insuficiente_nao_grava_nada(self):
+        with self.assertRaises(ValueError):
+            self.movimentar(Movimentacao.Tipo.SAIDA, 6)
+
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade_atual, 5)
+        self.assertEqual(self.produto.total_movimentacoes, 0)
+        self.assertFalse(Movimentacao.objects.exists())
+
+
+class InvalidacaoCachesDeEstoqueTests(TestCase):
+    """Views que alteram o estoque descartam o dashboard e o <select> de produtos."""
+
+    CHAVES = (DASHBOARD_CACHE_KEY, PRODUTOS_DROPDOWN_CACHE_KEY)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('teste'))
+        self.produto = Produto.objects.create(
+            codigo='P1', nome='Produto', instituicao=criar_instituicao(), quantidade_atual=5,
+        )
+        # Preenche os dois caches pelas próprias views
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('registrar_entrada'))
+        for chave in self.CHAVES:
+            self.assertIsNotNone(cache.get(chave), chave)
+
+    def assertCachesDescartados(self):
+        for chave in self.CHAVES:
+            self.assertIsNone(cache.get(chave), chave)
+
+    def test_registrar_entrada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(reverse('registrar_entrada'), {
+                'produto': self.produto.pk, 'quantidade': '2', 'motivo': 'Compra',
+            })
+
+        self.assertEqual(resposta.status_code, 302)
+        self.assertCachesDescartados()
+
+    def test_deletar_produto(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(reverse('deletar_produto', args=[self.produto.pk]))
+
+        self.assertEqual(resposta.status_code, 302)
+        self.assertCachesDescartados()
+
+class AplicarEmLoteTests(TestCase):
+
+    def test_saida_insuficiente_desfaz_o_lote_inteiro(self):
+        instituicao = criar_instituicao()
+        produto = Produto.objects.create(
+            codigo='P1', nome='Produto', instituicao=instituicao, quantidade_atual=5,
+        )
+        lote = [
+            Movimentacao(produto=produto, tipo=Movimentacao.Tipo.ENTRADA, quantidade=3),
+            Movimentacao(produto=produto, tipo=Movimentacao.Tipo.SAIDA, quantidade=20),
+        ]
+
+        with self.assertRaises(ValueError):
+            Movimentacao.aplicar_em_lote(lote)
+
+        produto.refresh_from_db()
+        self.assertEqual(produto.quantidade_atual, 5)
+        self.assertEqual(produto.total_movimentacoes, 0)
+        self.assertFalse(Movimentacao.objects.exists())
+
+
+class TipoParseTests(TestCase):
+
+    def test_parse(self):
+        casos = {
+            '1': Movimentacao.Tipo.ENTRADA,
+            'entrada': Movimentacao.Tipo.ENTRADA,
+            '': None,
+            '²': None,
+            '9': None,
+        }
+        for valor, esperado in casos.items():
+            with self.subTest(valor=valor):
+                self.assertEqual(Movimentacao.Tipo.parse(valor), esperado)
+
+
+class MigracaoTipoInteiroTests(TransactionTestCase):
+    """Migração 0006: `tipo` em texto passa a inteiro, e volta ao reverter."""
+
+    ANTES = [('almoxarifado', '0005_produto_total_movimentacoes')]
+    DEPOIS = [('almoxarifado', '0006_movimentacao_tipo_inteiro')]
+
+    def migrar(self, alvo):
+        executor = MigrationExecutor(connection)
+        executor.migrate(alvo)
+        return executor.loader.project_state(alvo).apps
+
+    def tearDown(self):
+        self.migrar(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def criar_movimentacoes(self, apps, tipos):
+        Instituicao = apps.get_model('almoxarifado', 'Instituicao')
+        Produto = apps.get_model('almoxarifado', 'Produto')
+        Movimentacao = apps.get_model('almoxarifado', 'Movimentacao')
+        instituicao = Instituicao.objects.create(
+            nome='I', cep='', logradouro='', numero='', bairro='', cidade='',
+            estado='SP', telefone='', cnpj='1',
+        )
+        produto = Produto.objects.create(codigo='P1', nome='P', instituicao=instituicao)
+        for tipo in tipos:
+            Movimentacao.objects.create(produto=produto, tipo=tipo, quantidade=1)
+
+    def tipos(self, apps):
+        Movimentacao = apps.get_model('almoxarifado', 'Movimentacao')
+        return list(Movimentacao.objects.order_by('id').values_list('tipo', flat=True))
+
+    def test_converte_texto_em_inteiro_e_reverte(self):
+        apps = self.migrar(self.ANTES)
+        self.criar_movimentacoes(apps, ['entrada', 'saida', 'ajuste'])
+
+        apps = self.migrar(self.DEPOIS)
+        self.assertEqual(self.tipos(apps), [1, 2, 3])
+
+        apps = self.migrar(self.ANTES)
+        self.assertEqual(self.tipos(apps), ['entrada', 'saida', 'ajuste'])
@@ -32,6 +32,7 @@ urlpatterns = [
 
     # MOVIMENTAÇÕES
     path('movimentacoes/', movimentacao_views.lista_movimentacoes, name='lista_movimentacoes'),
+    path('movimentacoes/exportar/', movimentacao_views.exportar_movimentacoes_csv, name='exportar_movimentacoes_csv'),
     path('movimentacoes/entrada/', movimentacao_views.registrar_entrada, name='registrar_entrada'),
     path('movimentacoes/saida/', movimentacao_views.registrar_saida, name='registrar_saida'),
     path('movimentacoes/<int:id>/', movimentacao_views.detalhes_movimentacao, name='detalhes_movimentacao'),
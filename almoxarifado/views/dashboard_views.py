@@ -9,34 +9,37 @@ calcular valores derivados no banco.
 
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
-from datetime import timedelta
-from ..models import Produto, Movimentacao, Funcionario, Instituicao
+from datetime import date, datetime, time, timedelta
+from ..models import (
+    Produto, Movimentacao, Funcionario, Instituicao,
+    DASHBOARD_CACHE_KEY, TIPOS_MOVIMENTACAO,
+)
+from ..paginacao import paginar_sem_contagem
+
+
+# Tempo (em segundos) que as métricas do dashboard permanecem em cache
+DASHBOARD_CACHE_TIMEOUT = 120
 
 
 # ====================================================================
 # DASHBOARD PRINCIPAL
 # ====================================================================
-@login_required(login_url='login_instituicoes')
-def dashboard(request):
-    """Dashboard com resumo do almoxarifado.
+def _metricas_dashboard():
+    """Calcula as métricas agregadas exibidas no dashboard.
 
-    Calcula métricas principais:
-    - total de produtos ativos
-    - quantidade de produtos com estoque abaixo do mínimo
-    - movimentações recentes (últimos 7 dias)
-    - valor total do estoque (quantidade * preço)
-    - top produtos por movimentação
+    O resultado é cacheado por `dashboard` e invalidado sempre que uma
+    movimentação é registrada (ver `Movimentacao.salvar_e_atualizar_estoque`).
     """
-    # Total de produtos
-    total_produtos = Produto.objects.filter(ativo=True).count()
-
-    # Produtos com estoque baixo
-    produtos_estoque_baixo = Produto.objects.filter(
-        ativo=True,
-        quantidade_atual__lte=F('quantidade_minima')
-    ).count()
+    # Métricas de produtos ativos em uma única consulta: total, estoque
+    # baixo e valor total do estoque (quantidade_atual * preco_unitario)
+    metricas_produtos = Produto.objects.filter(ativo=True).aggregate(
+        total=Count('id'),
+        baixo=Count('id', filter=Q(quantidade_atual__lte=F('quantidade_minima'))),
+        valor=Sum(F('quantidade_atual') * F('preco_unitario')),
+    )
 
     # Movimentações da última semana
     uma_semana_atras = timezone.now() - timedelta(days=7)
@@ -44,37 +47,53 @@ def dashboard(request):
         data_movimentacao__gte=uma_semana_atras
     ).count()
 
-    # Valor total do estoque: soma de (quantidade_atual * preco_unitario)
-    valor_total_estoque = Produto.objects.filter(ativo=True).aggregate(
-        total=Sum(F('quantidade_atual') * F('preco_unitario'))
-    )['total'] or 0
+    # Top 5 produtos mais movimentados (contador desnormalizado em Produto)
+    produtos_populares = list(Produto.objects.filter(
+        ativo=True, total_movimentacoes__gt=0
+    ).order_by('-total_movimentacoes').values('nome', 'codigo', 'total_movimentacoes')[:5])
+
+    # Resumo por tipo de movimentação (agregação condicional, uma consulta)
+    resumo_tipos = Movimentacao.objects.aggregate(
+        entradas=Count('id', filter=Q(tipo=Movimentacao.Tipo.ENTRADA)),
+        saidas=Count('id', filter=Q(tipo=Movimentacao.Tipo.SAIDA)),
+        ajustes=Count('id', filter=Q(tipo=Movimentacao.Tipo.AJUSTE)),
+    )
+
+    return {
+        'total_produtos': metricas_produtos['total'],
+        'produtos_estoque_baixo': metricas_produtos['baixo'],
+        'movimentacoes_semana': movimentacoes_semana,
+        'valor_total_estoque': metricas_produtos['valor'] or 0,
+        'produtos_populares': produtos_populares,
+        'entradas': resumo_tipos['entradas'],
+        'saidas': resumo_tipos['saidas'],
+        'ajustes': resumo_tipos['ajustes'],
+    }
 
-    # Top 5 produtos mais movimentados
-    produtos_populares = Movimentacao.objects.values('produto__nome', 'produto__codigo').annotate(
-        total_movimentacoes=Count('id')
-    ).order_by('-total_movimentacoes')[:5]
 
-    # Últimas movimentações
-    ultimas_movimentacoes = Movimentacao.objects.select_related(
-        'produto', 'funcionario'
-    ).order_by('-data_movimentacao')[:10]
+@login_required(login_url='login_instituicoes')
+def dashboard(request):
+    """Dashboard com resumo do almoxarifado.
 
-    # Resumo por tipo de movimentação
-    entradas = Movimentacao.objects.filter(tipo='entrada').count()
-    saidas = Movimentacao.objects.filter(tipo='saida').count()
-    ajustes = Movimentacao.objects.filter(tipo='ajuste').count()
+    Calcula métricas principais:
+    - total de produtos ativos
+    - quantidade de produtos com estoque abaixo do mínimo
+    - movimentações recentes (últimos 7 dias)
+    - valor total do estoque (quantidade * preço)
+    - top produtos por movimentação
 
-    context = {
-        'total_produtos': total_produtos,
-        'produtos_estoque_baixo': produtos_estoque_baixo,
-        'movimentacoes_semana': movimentacoes_semana,
-        'valor_total_estoque': valor_total_estoque,
-        'produtos_populares': produtos_populares,
-        'ultimas_movimentacoes': ultimas_movimentacoes,
-        'entradas': entradas,
-        'saidas': saidas,
-        'ajustes': ajustes,
-    }
+    As métricas ficam em cache por `DASHBOARD_CACHE_TIMEOUT` segundos; as
+    últimas movimentações são sempre consultadas para permanecerem atuais.
+    """
+    context = dict(cache.get_or_set(
+        DASHBOARD_CACHE_KEY, _metricas_dashboard, DASHBOARD_CACHE_TIMEOUT
+    ))
+
+    # Últimas movimentações — apenas as colunas exibidas no dashboard
+    context['ultimas_movimentacoes'] = Movimentacao.objects.select_related('produto').only(
+        'id', 'tipo', 'quantidade', 'data_movimentacao',
+        'produto__nome', 'produto__codigo',
+    ).order_by('-data_movimentacao')[:10]
 
     return render(request, 'dashboard.html', context)
 
@@ -85,7 +104,10 @@ def dashboard(request):
 @login_required(login_url='login_instituicoes')
 def relatorio_estoque(request):
     """Relatório completo de estoque com filtros por categoria e estoque baixo."""
-    produtos = Produto.objects.filter(ativo=True).select_related('categoria', 'instituicao')
+    # A instituição não é exibida no relatório; as descrições (TEXT) também não
+    produtos = Produto.objects.filter(ativo=True).select_related('categoria').defer(
+        'descricao', 'categoria__descricao'
+    )
 
     # Filtros
     categoria = request.GET.get('categoria', '').strip()
@@ -97,16 +119,16 @@ def relatorio_estoque(request):
     if estoque_baixo == 'sim':
         produtos = produtos.filter(quantidade_atual__lte=F('quantidade_minima'))
 
-    # Estatísticas
-    total_itens = produtos.aggregate(total=Sum('quantidade_atual'))['total'] or 0
-    valor_total = produtos.aggregate(
-        total=Sum(F('quantidade_atual') * F('preco_unitario'))
-    )['total'] or 0
+    # Estatísticas — as duas somas em uma única consulta
+    estatisticas = produtos.aggregate(
+        total_itens=Sum('quantidade_atual'),
+        valor_total=Sum(F('quantidade_atual') * F('preco_unitario')),
+    )
 
     context = {
         'produtos': produtos,
-        'total_itens': total_itens,
-        'valor_total': valor_total,
+        'total_itens': estatisticas['total_itens'] or 0,
+        'valor_total': estatisticas['valor_total'] or 0,
         'categoria': categoria,
         'estoque_baixo': estoque_baixo,
     }
@@ -117,49 +139,71 @@ def relatorio_estoque(request):
 # ====================================================================
 # RELATÓRIO DE MOVIMENTAÇÕES
 # ====================================================================
-@login_required(login_url='login_instituicoes')
-def relatorio_movimentacoes(request):
-    """Relatório de movimentações com filtros por período e tipo."""
-    from django.core.paginator import Paginator
+def _parse_data(valor):
+    """Converte uma data `AAAA-MM-DD` em `date`; retorna None se inválida."""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        return None
 
-    data_inicio = request.GET.get('data_inicio', '').strip()
-    data_fim = request.GET.get('data_fim', '').strip()
-    tipo = request.GET.get('tipo', '').strip()
 
-    movimentacoes = Movimentacao.objects.select_related('produto', 'funcionario')
+def _inicio_do_dia(data):
+    """Retorna o datetime (com fuso) da meia-noite de `data`."""
+    return timezone.make_aware(datetime.combine(data, time.min))
 
-    # Filtragem por datas — usamos try/except para ignorar valores inválidos
-    if data_inicio:
-        try:
-            movimentacoes = movimentacoes.filter(data_movimentacao__gte=data_inicio)
-        except Exception:
-            pass
 
-    if data_fim:
-        try:
-            movimentacoes = movimentacoes.filter(data_movimentacao__lte=data_fim)
-        except Exception:
-            pass
+@login_required(login_url='login_instituicoes')
+def relatorio_movimentacoes(request):
+    """Relatório de movimentações com filtros por período e tipo.
 
-    if tipo:
+    A paginação não conta o total de registros (ver `paginar_sem_contagem`):
+    o relatório exibe apenas o número da página atual.
+    """
+    data_inicio = request.GET.get('data_inicio', '').strip()
+    data_fim = request.GET.get('data_fim', '').strip()
+    tipo = Movimentacao.Tipo.parse(request.GET.get('tipo', '').strip())
+
+    # `observacoes` e a descrição do produto (TEXT) não aparecem no relatório
+    movimentacoes = Movimentacao.objects.select_related('produto', 'funcionario').defer(
+        'observacoes', 'produto__descricao'
+    )
+
+    # Filtragem por datas — valores inválidos são ignorados. Comparamos com
+    # o início do dia (fuso local) para que o índice em data_movimentacao
+    # possa ser usado; `data_fim` inclui o dia inteiro.
+    inicio = _parse_data(data_inicio)
+    if inicio is not None:
+        movimentacoes = movimentacoes.filter(data_movimentacao__gte=_inicio_do_dia(inicio))
+
+    fim = _parse_data(data_fim)
+    # Em `date.max` não há dia seguinte: o filtro incluiria tudo, então é omitido
+    if fim is not None and fim < date.max:
+        movimentacoes = movimentacoes.filter(
+            data_movimentacao__lt=_inicio_do_dia(fim + timedelta(days=1))
+        )
+
+    if tipo is not None:
         movimentacoes = movimentacoes.filter(tipo=tipo)
 
-    movimentacoes = movimentacoes.order_by('-data_movimentacao')
-
-    # Paginação
-    paginator = Paginator(movimentacoes, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Estatísticas — uma única agregação condicional, antes da ordenação
+    totais = movimentacoes.aggregate(
+        entradas=Count('id', filter=Q(tipo=Movimentacao.Tipo.ENTRADA)),
+        saidas=Count('id', filter=Q(tipo=Movimentacao.Tipo.SAIDA)),
+    )
+    total_entradas = totais['entradas']
+    total_saidas = totais['saidas']
 
-    # Estatísticas
-    total_entradas = movimentacoes.filter(tipo='entrada').count()
-    total_saidas = movimentacoes.filter(tipo='saida').count()
+    # Paginação sem COUNT(*) — busca só os 50 registros da página (+1)
+    page_obj = paginar_sem_contagem(
+        movimentacoes.order_by('-data_movimentacao'), request.GET.get('page'), 50
+    )
 
     context = {
         'page_obj': page_obj,
         'data_inicio': data_inicio,
         'data_fim': data_fim,
         'tipo': tipo,
+        'tipos': TIPOS_MOVIMENTACAO,
         'total_entradas': total_entradas,
         'total_saidas': total_saidas,
     }
@@ -173,14 +217,18 @@ def relatorio_movimentacoes(request):
 @login_required(login_url='login_instituicoes')
 def produtos_estoque_baixo(request):
     """Lista produtos com estoque abaixo do mínimo para ação imediata."""
-    produtos = Produto.objects.filter(
+    # Materializa uma única vez: o template itera a lista e o total sai
+    # de `len()`, sem um COUNT adicional
+    produtos = list(Produto.objects.filter(
         ativo=True,
         quantidade_atual__lte=F('quantidade_minima')
-    ).select_related('categoria', 'instituicao').order_by('quantidade_atual')
+    ).select_related('categoria').defer(
+        'descricao', 'categoria__descricao'
+    ).order_by('quantidade_atual'))
 
     context = {
         'produtos': produtos,
-        'total': produtos.count(),
+        'total': len(produtos),
     }
 
     return render(request, 'alerta_estoque_baixo.html', context)
@@ -13,7 +13,8 @@ from django.shortcuts import render, redirect, get_object_or_404  # renderiza te
 from django.db.models import Q  # usado para filtros com OR/AND no banco de dados
 from django.core.paginator import Paginator  # responsável pela paginação
 from django.contrib.auth.decorators import login_required  # usado para restringir acesso a usuários logados
-from ..models import Funcionario, Instituicao  # importando os modelos do app
+from ..models import Funcionario  # importando os modelos do app
+from ..listas import buscar_instituicao, instituicoes_ativas  # lista cacheada usada nos formulários
 
 # ====================================================================
 # LISTAR FUNCIONÁRIOS
@@ -28,12 +29,14 @@ def lista_funcionarios(request):
     # Busca todos os funcionários já trazendo a instituição relacionada (otimização do banco)
     funcionarios = Funcionario.objects.select_related('instituicao').all()
 
-    # Se houver termo de busca, filtra pelo nome, email ou telefone (case insensitive)
+    # Se houver termo de busca, filtra pelo nome (qualquer parte) ou pelo início
+    # do e-mail/telefone. O prefixo do e-mail tem índice (`func_upper_email`);
+    # o telefone não tem índice, só compara o início em vez de todo o texto
     if q:
         funcionarios = funcionarios.filter(
             Q(nome__icontains=q) |
-            Q(email__icontains=q) |
-            Q(telefone__icontains=q)
+            Q(email__istartswith=q) |
+            Q(telefone__startswith=q)
         )
 
     # Cria a paginação (10 funcionários por página)
@@ -80,14 +83,14 @@ def cadastrar_funcionarios(request):
             erros['nome'] = 'Nome é obrigatório.'
         if not email:
             erros['email'] = 'E-mail é obrigatório.'
+        instituicao = buscar_instituicao(instituicao_id) if instituicao_id else None
         if not instituicao_id:
             erros['instituicao'] = 'Instituição é obrigatória.'
+        elif instituicao is None:
+            erros['instituicao'] = 'Instituição inválida.'
 
         # Se não houver erros, salva no banco
         if not erros:
-            # Busca a instituição pelo ID
-            instituicao = get_object_or_404(Instituicao, pk=instituicao_id)
-
             # Cria o funcionário
             Funcionario.objects.create(
                 nome=nome,
@@ -100,7 +103,7 @@ def cadastrar_funcionarios(request):
             return redirect('lista_funcionarios')  # redireciona após salvar
 
     # Se não for POST ou se houver erro, recarrega o formulário
-    instituicoes = Instituicao.objects.all()
+    instituicoes = instituicoes_ativas()
     return render(
         request,
         'funcionario/cadastrar.html',
@@ -124,7 +127,7 @@ def editar_funcionarios(request, pk):
         'data_nascimento': funcionario.data_nascimento,
         'email': funcionario.email,
         'telefone': funcionario.telefone,
-        'instituicao': funcionario.instituicao.id if funcionario.instituicao else '',
+        'instituicao': funcionario.instituicao_id or '',  # usa o id direto, sem carregar a instituição
     }
 
     # Quando o formulário for enviado (POST)
@@ -144,13 +147,19 @@ def editar_funcionarios(request, pk):
             'instituicao': instituicao_id,
         })
 
-        # Validações
+        # Validações (a instituição atual continua aceita mesmo se desativada)
         if not nome:
             erros['nome'] = 'Nome é obrigatório.'
         if not email:
             erros['email'] = 'E-mail é obrigatório.'
+        instituicao = (
+            buscar_instituicao(instituicao_id, atual_id=funcionario.instituicao_id)
+            if instituicao_id else None
+        )
         if not instituicao_id:
             erros['instituicao'] = 'Instituição é obrigatória.'
+        elif instituicao is None:
+            erros['instituicao'] = 'Instituição inválida.'
 
         # Se não houver erros, atualiza no banco
         if not erros:
@@ -158,12 +167,15 @@ def editar_funcionarios(request, pk):
             funcionario.data_nascimento = data_nascimento
             funcionario.email = email
             funcionario.telefone = telefone
-            funcionario.instituicao = get_object_or_404(Instituicao, pk=instituicao_id)
+            funcionario.instituicao = instituicao
             funcionario.save()  # salva alterações
             return redirect('lista_funcionarios')
 
-    # Renderiza o formulário de edição
-    instituicoes = Instituicao.objects.all()
+    # Renderiza o formulário de edição; a instituição atual entra na lista
+    # mesmo que tenha sido desativada, para não ser trocada sem querer
+    instituicoes = instituicoes_ativas()
+    if all(inst.id != funcionario.instituicao_id for inst in instituicoes):
+        instituicoes = instituicoes + [funcionario.instituicao]
     return render(
         request,
         'funcionario/editar.html',
@@ -191,8 +203,11 @@ def funcionarios_pdf(request):
     """
     Gera e retorna um PDF com os dados de todos os funcionários usando um template HTML.
     """
-    # Busca todos os funcionários do banco
-    funcionarios = Funcionario.objects.all()
+    # Busca todos os funcionários já com a instituição (evita uma query por
+    # linha no template) e apenas as colunas exibidas no PDF
+    funcionarios = Funcionario.objects.select_related('instituicao').only(
+        'nome', 'data_nascimento', 'telefone', 'instituicao__nome'
+    )
 
     # Caminho do template HTML usado para gerar o PDF
     template_path = 'funcionario/pdf.html'
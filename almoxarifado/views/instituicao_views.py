@@ -5,19 +5,30 @@ Contém login/logout, CRUD de instituições, geração de PDF e views de área.
 As views de autenticação usam `authenticate`/`login`/`logout` do Django.
 """
 
-from django.http import HttpResponse
+import io
+
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.http import require_POST
 from django.template.loader import render_to_string
 from xhtml2pdf import pisa
 from django.shortcuts import render, redirect, get_object_or_404  # renderiza páginas HTML, redireciona e retorna 404 caso não encontre
 from django.db.models import Q  # usado para buscas avançadas (OR, AND)
 from django.core.paginator import Paginator  # usado para paginação 
 from ..models import Instituicao  
+from ..formularios import extrair_campos  # leitura dos campos do POST
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.contrib.auth.decorators import login_required
 
 
+# Campos do formulário de instituição (mesmos nomes dos campos do modelo)
+CAMPOS_INSTITUICAO = (
+    'nome', 'cep', 'logradouro', 'numero', 'bairro',
+    'cidade', 'estado', 'telefone', 'cnpj',
+)
+
+
 def login_instituicoes(request):
     """Autentica um usuário usando `username` e `password`.
 
@@ -50,9 +61,10 @@ def lista_instituicoes(request):
     # Pega todas as instituições
     instituicoes = Instituicao.objects.all()
 
-    # Se o usuário digitou algo na busca, filtra pelo nome ou CNPJ (case insensitive)
+    # Se o usuário digitou algo na busca, filtra pelo nome (case insensitive) ou
+    # pelo início do CNPJ — prefixo (LIKE 'x%') aproveita o índice único do CNPJ
     if q:
-        instituicoes = instituicoes.filter(Q(nome__icontains=q) | Q(cnpj__icontains=q))
+        instituicoes = instituicoes.filter(Q(nome__icontains=q) | Q(cnpj__startswith=q))
 
     # Cria paginação (10 itens por página)
     paginator = Paginator(instituicoes, 10)
@@ -77,39 +89,19 @@ def cadastrar_instituicoes(request):
     val = {}    # dicionário para guardar os valores preenchidos (caso precise reaparecer no form)
 
     if request.method == 'POST':  # Se o formulário foi enviado
-        # Captura os dados enviados no formulário
-        nome = request.POST.get('nome', '').strip()
-        cep = request.POST.get('cep', '').strip()
-        logradouro = request.POST.get('logradouro', '').strip()
-        numero = request.POST.get('numero', '').strip()
-        bairro = request.POST.get('bairro', '').strip()
-        cidade = request.POST.get('cidade', '').strip()
-        estado = request.POST.get('estado', '').strip()
-        telefone = request.POST.get('telefone', '').strip()
-        cnpj = request.POST.get('cnpj', '').strip()
-
-        # Salva os valores preenchidos para reaparecer em caso de erro
-        val = locals()
+        # Captura os dados enviados no formulário; o mesmo dicionário guarda
+        # os valores preenchidos para reaparecer em caso de erro
+        val = extrair_campos(request.POST, CAMPOS_INSTITUICAO)
 
         # Validações
-        if not nome:
+        if not val['nome']:
             erros['nome'] = 'Nome é obrigatório.'
-        if not cnpj:
+        if not val['cnpj']:
             erros['cnpj'] = 'CNPJ é obrigatório.'
 
         # Se não tiver erro, cria a instituição no banco
         if not erros:
-            Instituicao.objects.create(
-                nome=nome,
-                cep=cep,
-                logradouro=logradouro,
-                numero=numero,
-                bairro=bairro,
-                cidade=cidade,
-                estado=estado,
-                telefone=telefone,
-                cnpj=cnpj
-            )
+            Instituicao.objects.create(**val)
             return redirect('lista_instituicoes')  # Redireciona após salvar
 
     # Renderiza o formulário de cadastro
@@ -131,50 +123,25 @@ def editar_instituicoes(request, pk):
 
     # Dicionários para erros e valores iniciais do form
     erros = {}
-    val = {
-        'nome': instituicao.nome,
-        'cep': instituicao.cep,
-        'logradouro': instituicao.logradouro,
-        'numero': instituicao.numero,
-        'bairro': instituicao.bairro,
-        'cidade': instituicao.cidade,
-        'estado': instituicao.estado,
-        'telefone': instituicao.telefone,
-        'cnpj': instituicao.cnpj,
-    }
+    val = {campo: getattr(instituicao, campo) for campo in CAMPOS_INSTITUICAO}
 
     if request.method == 'POST':  # Se o formulário foi enviado
         # Pega os dados enviados
-        nome = request.POST.get('nome', '').strip()
-        cep = request.POST.get('cep', '').strip()
-        logradouro = request.POST.get('logradouro', '').strip()
-        numero = request.POST.get('numero', '').strip()
-        bairro = request.POST.get('bairro', '').strip()
-        cidade = request.POST.get('cidade', '').strip()
-        estado = request.POST.get('estado', '').strip()
-        telefone = request.POST.get('telefone', '').strip()
-        cnpj = request.POST.get('cnpj', '').strip()
+        dados = extrair_campos(request.POST, CAMPOS_INSTITUICAO)
 
         # Atualiza os valores no dicionário para manter preenchido
-        val.update(locals())
+        val.update(dados)
 
         # Validações
-        if not nome:
+        if not dados['nome']:
             erros['nome'] = 'Nome é obrigatório.'
-        if not cnpj:
+        if not dados['cnpj']:
             erros['cnpj'] = 'CNPJ é obrigatório.'
 
         # Se não tiver erro, atualiza no banco
         if not erros:
-            instituicao.nome = nome
-            instituicao.cep = cep
-            instituicao.logradouro = logradouro
-            instituicao.numero = numero
-            instituicao.bairro = bairro
-            instituicao.cidade = cidade
-            instituicao.estado = estado
-            instituicao.telefone = telefone
-            instituicao.cnpj = cnpj
+            for campo, valor in dados.items():
+                setattr(instituicao, campo, valor)
             instituicao.save()
             return redirect('lista_instituicoes')
 
@@ -188,18 +155,18 @@ def editar_instituicoes(request, pk):
 # ====================================================================
 # EXCLUIR INSTITUIÇÃO
 # ====================================================================
+@require_POST
 def excluir_instituicao(request, pk):
     """
-    Exclui uma instituição.
+    Exclui uma instituição (apenas via POST; outros métodos recebem 405).
     """
-    # Busca a instituição pelo ID
-    instituicao = get_object_or_404(Instituicao, pk=pk)
+    # Exclui direto pelo filtro, sem carregar a instituição antes; os
+    # registros dependentes (CASCADE) e os sinais são tratados pelo Django
+    excluidas, _ = Instituicao.objects.filter(pk=pk).delete()
+    if not excluidas:
+        raise Http404('Instituição não encontrada.')
 
-    # Se for POST, confirma exclusão
-    if request.method == 'POST':
-        instituicao.delete()
-
-    # Sempre redireciona para a lista após a ação
+    # Redireciona para a lista após a exclusão
     return redirect('lista_instituicoes')
 
 
@@ -214,8 +181,10 @@ def instituicao_pdf(request):
     """
     Gera e retorna um PDF com os dados de todas as instituições usando um template HTML.
     """
-    # Busca todas as instituições do banco
-    instituicoes = Instituicao.objects.all()
+    # Busca todas as instituições do banco, apenas com as colunas exibidas
+    instituicoes = Instituicao.objects.only(
+        'nome', 'cep', 'logradouro', 'bairro', 'cidade', 'estado', 'telefone', 'cnpj'
+    )
 
     # Caminho do template HTML usado para gerar o PDF
     template_path = 'instituicao/pdf.html'
@@ -226,18 +195,18 @@ def instituicao_pdf(request):
     # Renderiza o HTML em string
     html = render_to_string(template_path, context)
 
-    # Configuração da resposta HTTP
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="instituicoes.pdf"'
-
-    # Gera o PDF
-    pisa_status = pisa.CreatePDF(html, dest=response)
+    # Gera o PDF em memória
+    buffer = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=buffer)
 
     # Verifica se houve erro
     if pisa_status.err:
         return HttpResponse('Erro ao gerar PDF', status=500)
 
-    return response
+    # Envia o arquivo em blocos; FileResponse define Content-Type,
+    # Content-Length e Content-Disposition a partir do nome do arquivo
+    buffer.seek(0)
+    return FileResponse(buffer, as_attachment=True, filename='instituicoes.pdf')
 
  
 def area_instituicoes(request):
@@ -1,36 +1,76 @@
 """
 Views para gerenciamento de movimentações do almoxarifado.
 
-Contém listagem, registro de entradas/saídas, detalhes e validações
-simples. As operações que alteram o estoque utilizam `transaction.atomic`
+Contém listagem, exportação em CSV, registro de entradas/saídas, detalhes e validações
+simples. As operações que alteram o estoque passam por
+`Movimentacao.salvar_e_atualizar_estoque`, que usa `transaction.atomic`
 para garantir consistência entre `Movimentacao` e `Produto`.
 """
 
+import csv
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.cache import cache
 from django.db.models import Q
-from django.core.paginator import Paginator
-from django.db import transaction
-from ..models import Movimentacao, Produto, Funcionario
+from django.utils import timezone
+from ..models import (
+    Movimentacao, Produto, Funcionario,
+    FUNCIONARIO_PADRAO_CACHE_KEY, PRODUTOS_DROPDOWN_CACHE_KEY, TIPOS_MOVIMENTACAO,
+)
+from ..paginacao import paginar_por_chave
+from ..formularios import extrair_campos
 
 
-# ====================================================================
-# LISTAR MOVIMENTAÇÕES
-# ====================================================================
-@login_required(login_url='login_instituicoes')
-def lista_movimentacoes(request):
-    """Lista todas as movimentações com filtros por tipo e produto.
+# Campos dos formulários de entrada e saída
+CAMPOS_MOVIMENTACAO = ('produto', 'quantidade', 'motivo', 'observacoes')
 
-    - `q`: busca por nome/código do produto ou pelo motivo.
-    - `tipo`: filtra por tipo (entrada/saida/ajuste).
-    Os resultados são paginados para evitar retorno excessivo.
+
+def _funcionario_padrao_id():
+    """Id do funcionário registrado nas movimentações feitas pelas views.
+
+    É o primeiro funcionário pela ordenação padrão (nome), ou None se não
+    houver nenhum. Fica 300s em cache e é invalidado sempre que um
+    funcionário é salvo ou removido (ver `almoxarifado.signals`).
     """
-    q = request.GET.get('q', '').strip()
-    tipo = request.GET.get('tipo', '').strip()
+    return cache.get_or_set(
+        FUNCIONARIO_PADRAO_CACHE_KEY,
+        lambda: Funcionario.objects.values_list('id', flat=True).first(),
+        300,
+    )
+
+
+def _buscar_produto(produto_id):
+    """Produto (apenas `id` e `nome`) com o id informado, ou None."""
+    try:
+        produto_id = int(produto_id)
+    except ValueError:
+        return None
+    return Produto.objects.filter(pk=produto_id).only('id', 'nome').first()
 
-    movimentacoes = Movimentacao.objects.select_related('produto', 'funcionario').all()
 
+def _produtos_dropdown():
+    """Produtos ativos para o <select> de entrada/saída, como dicionários.
+
+    Só as colunas exibidas são lidas (`.values()` evita instanciar modelos).
+    A lista fica 60s em cache e é invalidada a cada alteração de produto ou
+    de estoque (ver `almoxarifado.signals` e `invalidar_caches_de_estoque`).
+    """
+    return cache.get_or_set(
+        PRODUTOS_DROPDOWN_CACHE_KEY,
+        lambda: list(
+            Produto.objects.filter(ativo=True)
+            .values('id', 'nome', 'codigo', 'quantidade_atual')
+            .order_by('nome')
+        ),
+        60,
+    )
+
+
+def _filtrar_movimentacoes(movimentacoes, q, tipo):
+    """Aplica os filtros da lista (busca `q` e `tipo`) a `movimentacoes`."""
     if q:
         movimentacoes = movimentacoes.filter(
             Q(produto__nome__icontains=q) |
@@ -38,27 +78,122 @@ def lista_movimentacoes(request):
             Q(motivo__icontains=q)
         )
 
-    if tipo:
+    if tipo is not None:
         movimentacoes = movimentacoes.filter(tipo=tipo)
 
-    paginator = Paginator(movimentacoes, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return movimentacoes
 
-    tipos = Movimentacao.TIPO_CHOICES
+
+# ====================================================================
+# LISTAR MOVIMENTAÇÕES
+# ====================================================================
+@login_required(login_url='login_instituicoes')
+def lista_movimentacoes(request):
+    """Lista todas as movimentações com filtros por tipo e produto.
+
+    - `q`: busca por nome/código do produto ou pelo motivo.
+    - `tipo`: filtra por tipo (`Movimentacao.Tipo`; aceita número ou nome).
+    - `after`: id da última movimentação da página anterior.
+    Os resultados são paginados por chave (mais recentes primeiro), sem
+    COUNT nem OFFSET.
+    """
+    q = request.GET.get('q', '').strip()
+    tipo = Movimentacao.Tipo.parse(request.GET.get('tipo', '').strip())
+
+    # Apenas as colunas exibidas na lista; `motivo` e `observacoes` só
+    # aparecem em `detalhes_movimentacao`
+    movimentacoes = Movimentacao.objects.select_related('produto', 'funcionario').only(
+        'id', 'tipo', 'quantidade', 'data_movimentacao',
+        'produto__nome', 'produto__codigo', 'funcionario__nome',
+    )
+
+    movimentacoes = _filtrar_movimentacoes(movimentacoes, q, tipo)
+
+    page_obj = paginar_por_chave(movimentacoes, request.GET.get('after'), 20)
 
     return render(
         request,
         'movimentacao/lista.html',
         {
             'page_obj': page_obj,
-            'tipos': tipos,
+            'tipos': TIPOS_MOVIMENTACAO,
             'q': q,
             'tipo': tipo
         }
     )
 
 
+# ====================================================================
+# EXPORTAR MOVIMENTAÇÕES (CSV)
+# ====================================================================
+class _EcoCSV:
+    """Pseudo-arquivo para `csv.writer`: `write` devolve a linha formatada."""
+
+    def write(self, valor):
+        return valor
+
+
+# Caracteres que fazem o Excel/LibreOffice interpretar a célula como fórmula
+_INICIO_DE_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto_seguro(valor):
+    """Neutraliza texto digitado pelo usuário que seria lido como fórmula.
+
+    Prefixa com `'` os valores que começam com um de `_INICIO_DE_FORMULA`
+    (injeção de fórmulas em CSV); o Excel exibe o texto sem o apóstrofo.
+    """
+    if valor and valor.startswith(_INICIO_DE_FORMULA):
+        return "'" + valor
+    return valor
+
+
+@login_required(login_url='login_instituicoes')
+def exportar_movimentacoes_csv(request):
+    """Exporta em CSV as movimentações, com os mesmos filtros da lista.
+
+    As linhas são lidas do banco com `iterator(chunk_size=2000)` (cursor do
+    lado do servidor no PostgreSQL) e enviadas por `StreamingHttpResponse`
+    à medida que são formatadas, então a memória usada não cresce com o
+    número de movimentações.
+    """
+    q = request.GET.get('q', '').strip()
+    tipo = Movimentacao.Tipo.parse(request.GET.get('tipo', '').strip())
+
+    movimentacoes = _filtrar_movimentacoes(Movimentacao.objects.all(), q, tipo).order_by('-id').values_list(
+        'id', 'data_movimentacao', 'tipo', 'produto__codigo', 'produto__nome',
+        'quantidade', 'motivo', 'funcionario__nome', 'observacoes',
+    )
+    rotulos = dict(Movimentacao.Tipo.choices)
+    # `;` como separador: o Excel em português usa `,` como separador decimal
+    writer = csv.writer(_EcoCSV(), delimiter=';')
+
+    def linhas():
+        # BOM para o Excel reconhecer o arquivo como UTF-8
+        yield '\ufeff'
+        yield writer.writerow([
+            'ID', 'Data', 'Tipo', 'Código', 'Produto', 'Quantidade',
+            'Motivo', 'Funcionário', 'Observações',
+        ])
+        for (id_mov, data, tipo_mov, codigo, nome, quantidade,
+                motivo, funcionario, observacoes) in movimentacoes.iterator(chunk_size=2000):
+            yield writer.writerow([
+                id_mov,
+                timezone.localtime(data).strftime('%d/%m/%Y %H:%M'),
+                rotulos.get(tipo_mov, tipo_mov),
+                _texto_seguro(codigo),
+                _texto_seguro(nome),
+                quantidade,
+                _texto_seguro(motivo),
+                _texto_seguro(funcionario) or 'Sistema',
+                _texto_seguro(observacoes),
+            ])
+
+    response = StreamingHttpResponse(linhas(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="movimentacoes.csv"'
+    return response
+
+
 # ====================================================================
 # REGISTRAR ENTRADA
 # ====================================================================
@@ -74,17 +209,11 @@ def registrar_entrada(request):
     val = {}
 
     if request.method == 'POST':
-        produto_id = request.POST.get('produto', '').strip()
-        quantidade = request.POST.get('quantidade', '0').strip()
-        motivo = request.POST.get('motivo', '').strip()
-        observacoes = request.POST.get('observacoes', '').strip()
-
-        val = {
-            'produto': produto_id,
-            'quantidade': quantidade,
-            'motivo': motivo,
-            'observacoes': observacoes,
-        }
+        val = extrair_campos(request.POST, CAMPOS_MOVIMENTACAO, {'quantidade': '0'})
+        produto_id = val['produto']
+        quantidade = val['quantidade']
+        motivo = val['motivo']
+        observacoes = val['observacoes']
 
         # Validações
         if not produto_id:
@@ -102,33 +231,25 @@ def registrar_entrada(request):
             erros['motivo'] = 'Motivo é obrigatório.'
 
         if not erros:
-            try:
-                produto = Produto.objects.get(pk=produto_id)
-                funcionario = None
-
-                try:
-                    funcionario = Funcionario.objects.first()
-                except Funcionario.DoesNotExist:
-                    pass
-
-                with transaction.atomic():
-                    movimentacao = Movimentacao(
-                        produto=produto,
-                        tipo='entrada',
-                        quantidade=quantidade,
-                        motivo=motivo,
-                        observacoes=observacoes,
-                        funcionario=funcionario
-                    )
-                    movimentacao.salvar_e_atualizar_estoque()
+            produto = _buscar_produto(produto_id)
+            if produto is None:
+                erros['produto'] = 'Produto não encontrado.'
+            else:
+                # `salvar_e_atualizar_estoque` já executa em transação própria
+                movimentacao = Movimentacao(
+                    produto_id=produto.pk,
+                    tipo=Movimentacao.Tipo.ENTRADA,
+                    quantidade=quantidade,
+                    motivo=motivo,
+                    observacoes=observacoes,
+                    funcionario_id=_funcionario_padrao_id()
+                )
+                movimentacao.salvar_e_atualizar_estoque()
 
                 messages.success(request, f'Entrada de {quantidade} unidade(s) de "{produto.nome}" registrada!')
                 return redirect('lista_movimentacoes')
 
-            except Produto.DoesNotExist:
-                erros['produto'] = 'Produto não encontrado.'
-
-    produtos = Produto.objects.filter(ativo=True).select_related('categoria')
+    produtos = _produtos_dropdown()
 
     return render(
         request,
@@ -148,25 +269,20 @@ def registrar_entrada(request):
 def registrar_saida(request):
     """Registra uma saída de produto do estoque.
 
-    Antes de criar a movimentação verifica se há estoque suficiente
-    para evitar inconsistências. Em caso de estoque insuficiente, a
-    view retorna mensagem de erro para o usuário.
+    O estoque disponível é verificado pelo próprio UPDATE que baixa o
+    saldo (ver `Movimentacao.salvar_e_atualizar_estoque`), sem leitura
+    prévia. Em caso de estoque insuficiente, a view retorna mensagem de
+    erro para o usuário.
     """
     erros = {}
     val = {}
 
     if request.method == 'POST':
-        produto_id = request.POST.get('produto', '').strip()
-        quantidade = request.POST.get('quantidade', '0').strip()
-        motivo = request.POST.get('motivo', '').strip()
-        observacoes = request.POST.get('observacoes', '').strip()
-
-        val = {
-            'produto': produto_id,
-            'quantidade': quantidade,
-            'motivo': motivo,
-            'observacoes': observacoes,
-        }
+        val = extrair_campos(request.POST, CAMPOS_MOVIMENTACAO, {'quantidade': '0'})
+        produto_id = val['produto']
+        quantidade = val['quantidade']
+        motivo = val['motivo']
+        observacoes = val['observacoes']
 
         # Validações
         if not produto_id:
@@ -184,36 +300,34 @@ def registrar_saida(request):
             erros['motivo'] = 'Motivo é obrigatório.'
 
         if not erros:
-            try:
-                produto = Produto.objects.get(pk=produto_id)
-
-                if produto.quantidade_atual < quantidade:
-                    erros['quantidade'] = f'Estoque insuficiente. Disponível: {produto.quantidade_atual}'
+            produto = _buscar_produto(produto_id)
+            if produto is None:
+                erros['produto'] = 'Produto não encontrado.'
+            else:
+                # O saldo não é conferido aqui: `salvar_e_atualizar_estoque`
+                # faz um único UPDATE condicional (quantidade_atual >= quantidade)
+                # na sua transação e lança `ValueError` se não houver estoque
+                movimentacao = Movimentacao(
+                    produto_id=produto.pk,
+                    tipo=Movimentacao.Tipo.SAIDA,
+                    quantidade=quantidade,
+                    motivo=motivo,
+                    observacoes=observacoes,
+                    funcionario_id=_funcionario_padrao_id()
+                )
+                try:
+                    movimentacao.salvar_e_atualizar_estoque()
+                except ValueError:
+                    # Só no caso de erro lê o saldo atual para a mensagem
+                    disponivel = Produto.objects.values_list(
+                        'quantidade_atual', flat=True
+                    ).get(pk=produto.pk)
+                    erros['quantidade'] = f'Estoque insuficiente. Disponível: {disponivel}'
                 else:
-                    funcionario = None
-                    try:
-                        funcionario = Funcionario.objects.first()
-                    except Funcionario.DoesNotExist:
-                        pass
-
-                    with transaction.atomic():
-                        movimentacao = Movimentacao(
-                            produto=produto,
-                            tipo='saida',
-                            quantidade=quantidade,
-                            motivo=motivo,
-                            observacoes=observacoes,
-                            funcionario=funcionario
-                        )
-                        movimentacao.salvar_e_atualizar_estoque()
-
                     messages.success(request, f'Saída de {quantidade} unidade(s) de "{produto.nome}" registrada!')
                     return redirect('lista_movimentacoes')
 
-            except Produto.DoesNotExist:
-                erros['produto'] = 'Produto não encontrado.'
-
-    produtos = Produto.objects.filter(ativo=True).select_related('categoria')
+    produtos = _produtos_dropdown()
 
     return render(
         request,
@@ -235,7 +349,10 @@ def detalhes_movimentacao(request, id):
 
     Mostra produto, funcionário, tipo, quantidade, motivo e observações.
     """
-    movimentacao = get_object_or_404(Movimentacao, pk=id)
+    # Produto (com categoria) e funcionário exibidos no template vêm no mesmo JOIN
+    movimentacao = get_object_or_404(
+        Movimentacao.objects.select_related('produto__categoria', 'funcionario'), pk=id
+    )
 
     return render(
         request,
@@ -1,9 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import IntegrityError, transaction
 from django.db.models import Q
-from django.core.paginator import Paginator
-from ..models import Produto, Categoria, Instituicao, Movimentacao, Funcionario
+from django.http import Http404
+from django.utils import timezone
+from ..models import Produto, Movimentacao, Funcionario, invalidar_caches_de_estoque
+from ..paginacao import paginar_por_chave
+from ..formularios import extrair_campos
+from ..listas import buscar_categoria, buscar_instituicao, categorias_ativas, instituicoes_ativas
 
 
 """
@@ -14,6 +19,12 @@ listas longas e validam entradas do usuário antes de persistir.
 """
 
 
+# Campos editáveis do formulário de produto (cadastro acrescenta código e
+# instituição); campos numéricos ausentes valem '0'
+CAMPOS_PRODUTO = ('nome', 'descricao', 'categoria', 'quantidade_minima', 'preco_unitario')
+PADROES_NUMERICOS = {'quantidade_minima': '0', 'preco_unitario': '0'}
+
+
 # ====================================================================
 # LISTAR PRODUTOS
 # ====================================================================
@@ -23,13 +34,18 @@ def lista_produtos(request):
 
     - Consulta `q` para busca livre em nome/código.
     - `categoria` filtra por categoria ativa.
-    - Os resultados são paginados para evitar carregamento excessivo.
+    - Os resultados são paginados por chave (ordem alfabética, `?after=`
+      com o id do último produto exibido) para evitar carregamento excessivo.
     """
     q = request.GET.get('q', '').strip()
     categoria_id = request.GET.get('categoria', '').strip()
 
-    # Carrega relacionamentos que serão exibidos para evitar queries extras
-    produtos = Produto.objects.select_related('categoria', 'instituicao').filter(ativo=True)
+    # Carrega a categoria (exibida na lista) no mesmo SELECT e apenas as
+    # colunas usadas pelo template — `descricao` e afins ficam de fora
+    produtos = Produto.objects.select_related('categoria').filter(ativo=True).only(
+        'id', 'codigo', 'nome', 'quantidade_atual', 'quantidade_minima',
+        'preco_unitario', 'categoria__nome',
+    )
 
     if q:
         # Busca por nome ou código (case-insensitive)
@@ -45,12 +61,10 @@ def lista_produtos(request):
         except (ValueError, TypeError):
             pass
 
-    # Paginação padrão (15 por página)
-    paginator = Paginator(produtos, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por chave (15 por página), sem COUNT nem OFFSET
+    page_obj = paginar_por_chave(produtos, request.GET.get('after'), 15, ordem=('nome', 'id'))
 
-    categorias = Categoria.objects.filter(ativo=True)
+    categorias = categorias_ativas()
 
     return render(
         request,
@@ -76,31 +90,33 @@ def cadastrar_produto(request):
     val = {}
 
     if request.method == 'POST':
-        codigo = request.POST.get('codigo', '').strip()
-        nome = request.POST.get('nome', '').strip()
-        descricao = request.POST.get('descricao', '').strip()
-        categoria_id = request.POST.get('categoria', '').strip()
-        quantidade_minima = request.POST.get('quantidade_minima', '0').strip()
-        preco_unitario = request.POST.get('preco_unitario', '0').strip()
-        instituicao_id = request.POST.get('instituicao', '').strip()
-
-        val = {
-            'codigo': codigo,
-            'nome': nome,
-            'descricao': descricao,
-            'categoria': categoria_id,
-            'quantidade_minima': quantidade_minima,
-            'preco_unitario': preco_unitario,
-            'instituicao': instituicao_id,
-        }
+        val = extrair_campos(
+            request.POST,
+            ('codigo', 'instituicao') + CAMPOS_PRODUTO,
+            PADROES_NUMERICOS,
+        )
+        codigo = val['codigo']
+        nome = val['nome']
+        descricao = val['descricao']
+        categoria_id = val['categoria']
+        quantidade_minima = val['quantidade_minima']
+        preco_unitario = val['preco_unitario']
+        instituicao_id = val['instituicao']
 
         # Validações
         if not codigo:
             erros['codigo'] = 'Código é obrigatório.'
         if not nome:
             erros['nome'] = 'Nome é obrigatório.'
+        instituicao = buscar_instituicao(instituicao_id) if instituicao_id else None
         if not instituicao_id:
             erros['instituicao'] = 'Instituição é obrigatória.'
+        elif instituicao is None:
+            erros['instituicao'] = 'Instituição inválida.'
+        # Categoria é opcional, mas um valor informado precisa existir
+        categoria = buscar_categoria(categoria_id) if categoria_id else None
+        if categoria_id and categoria is None:
+            erros['categoria'] = 'Categoria inválida.'
 
         try:
             quantidade_minima = int(quantidade_minima)
@@ -116,30 +132,27 @@ def cadastrar_produto(request):
 
         if not erros:
             try:
-                instituicao = Instituicao.objects.get(pk=instituicao_id)
-                categoria = None
-                if categoria_id:
-                    try:
-                        categoria = Categoria.objects.get(pk=categoria_id)
-                    except Categoria.DoesNotExist:
-                        pass
-
-                Produto.objects.create(
-                    codigo=codigo,
-                    nome=nome,
-                    descricao=descricao,
-                    categoria=categoria,
-                    instituicao=instituicao,
-                    quantidade_minima=quantidade_minima,
-                    preco_unitario=preco_unitario
-                )
+                # Transação própria: a falha de unicidade não deve invalidar
+                # uma transação externa (ex.: ATOMIC_REQUESTS)
+                with transaction.atomic():
+                    Produto.objects.create(
+                        codigo=codigo,
+                        nome=nome,
+                        descricao=descricao,
+                        categoria=categoria,
+                        instituicao=instituicao,
+                        quantidade_minima=quantidade_minima,
+                        preco_unitario=preco_unitario
+                    )
+            except IntegrityError:
+                # `codigo` é único em toda a tabela
+                erros['codigo'] = 'Já existe um produto com este código.'
+            else:
                 messages.success(request, f'Produto "{nome}" cadastrado com sucesso!')
                 return redirect('lista_produtos')
-            except Produto.DoesNotExist:
-                erros['geral'] = 'Produto com este código já existe para esta instituição.'
 
-    instituicoes = Instituicao.objects.filter(ativo=True)
-    categorias = Categoria.objects.filter(ativo=True)
+    instituicoes = instituicoes_ativas()
+    categorias = categorias_ativas()
 
     return render(
         request,
@@ -165,14 +178,22 @@ def editar_produto(request, id):
     erros = {}
 
     if request.method == 'POST':
-        nome = request.POST.get('nome', '').strip()
-        descricao = request.POST.get('descricao', '').strip()
-        categoria_id = request.POST.get('categoria', '').strip()
-        quantidade_minima = request.POST.get('quantidade_minima', '0').strip()
-        preco_unitario = request.POST.get('preco_unitario', '0').strip()
+        dados = extrair_campos(request.POST, CAMPOS_PRODUTO, PADROES_NUMERICOS)
+        nome = dados['nome']
+        descricao = dados['descricao']
+        categoria_id = dados['categoria']
+        quantidade_minima = dados['quantidade_minima']
+        preco_unitario = dados['preco_unitario']
 
         if not nome:
             erros['nome'] = 'Nome é obrigatório.'
+        # Categoria vazia mantém a atual; a atual é aceita mesmo se desativada
+        categoria = (
+            buscar_categoria(categoria_id, atual_id=produto.categoria_id)
+            if categoria_id else None
+        )
+        if categoria_id and categoria is None:
+            erros['categoria'] = 'Categoria inválida.'
 
         try:
             quantidade_minima = int(quantidade_minima)
@@ -190,17 +211,14 @@ def editar_produto(request, id):
             produto.quantidade_minima = quantidade_minima
             produto.preco_unitario = preco_unitario
 
-            if categoria_id:
-                try:
-                    produto.categoria = Categoria.objects.get(pk=categoria_id)
-                except Categoria.DoesNotExist:
-                    pass
+            if categoria is not None:
+                produto.categoria = categoria
 
             produto.save()
             messages.success(request, f'Produto "{nome}" atualizado com sucesso!')
             return redirect('lista_produtos')
 
-    categorias = Categoria.objects.filter(ativo=True)
+    categorias = categorias_ativas()
 
     return render(
         request,
@@ -220,16 +238,25 @@ def editar_produto(request, id):
 def deletar_produto(request, id):
     """
     Deleta um produto (soft delete - marca como inativo).
-    """
-    produto = get_object_or_404(Produto, pk=id)
-    nome = produto.nome
 
+    O GET exibe a confirmação; o POST marca o produto como inativo com um
+    único UPDATE, sem carregá-lo.
+    """
     if request.method == 'POST':
-        produto.ativo = False
-        produto.save()
-        messages.success(request, f'Produto "{nome}" removido com sucesso!')
+        atualizados = Produto.objects.filter(pk=id).update(
+            ativo=False, data_atualizacao=timezone.now()
+        )
+        if not atualizados:
+            raise Http404('Produto não encontrado.')
+
+        # `update()` não dispara sinais: descarta os caches que listam
+        # produtos ativos (dashboard e <select> de entrada/saída)
+        invalidar_caches_de_estoque()
+        messages.success(request, 'Produto removido com sucesso!')
         return redirect('lista_produtos')
 
+    produto = get_object_or_404(Produto.objects.select_related('categoria'), pk=id)
+
     return render(
         request,
         'produto/deletar.html',